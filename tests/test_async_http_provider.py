@@ -1,16 +1,36 @@
+import asyncio
+import json
 import logging
 from unittest.mock import Mock, patch
 
 import pytest
+from aiohttp import ClientSession, TCPConnector
 from web3 import AsyncWeb3
-
-from tests.mocked_requests import mocked_async_request_get, mocked_async_request_poa
+from web3._utils.rpc_abi import RPC
+from web3.utils import RequestCacheValidationThreshold
+
+from tests.mocked_requests import (
+    mocked_batch_request_get,
+    mocked_mainnet_request_get,
+    mocked_request_get,
+    mocked_request_poa,
+)
 from web3_multi_provider import (
     AsyncFallbackProvider,
     AsyncMultiProvider,
     NoActiveProviderError,
     ProtocolNotSupported,
 )
+from web3_multi_provider.async_multi_http_provider import AsyncBaseMultiProvider
+
+
+@pytest.fixture
+def make_post_request():
+    with patch(
+        "web3._utils.http_session_manager.HTTPSessionManager.async_make_post_request",
+        side_effect=mocked_request_get,
+    ) as mock:
+        yield mock
 
 
 class TestHttpProvider:
@@ -20,70 +40,73 @@ class TestHttpProvider:
     def __inject_fixtures(self, caplog):
         self._caplog = caplog
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.async_make_post_request",
-        side_effect=mocked_async_request_get,
-    )
-    @pytest.mark.asyncio
-    async def test_one_provider_works(self, make_post_request):
-        await self.one_provider_works(AsyncMultiProvider)
-        await self.one_provider_works(AsyncFallbackProvider)
-
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.async_make_post_request",
-        side_effect=mocked_async_request_get,
+    @pytest.mark.parametrize(
+        "provider_class, call_count",
+        [(AsyncMultiProvider, 3), (AsyncFallbackProvider, 4)],
     )
     @pytest.mark.asyncio
-    async def test_nothing_works(self, make_post_request):
-        self._caplog.set_level(logging.WARNING)
-
-        provider = AsyncMultiProvider(
+    async def test_one_provider_works(
+        self, make_post_request: Mock, provider_class, call_count
+    ):
+        provider = provider_class(
             [
                 "http://127.0.0.1:9001",
-                "http://127.0.0.1:9002",
+                "http://127.0.0.1:9000",
             ]
         )
 
         w3 = AsyncWeb3(provider)
 
-        with self._caplog.at_level(logging.DEBUG):
-            with pytest.raises(NoActiveProviderError):
-                await w3.eth.get_block("latest")
+        with self._caplog.at_level(logging.DEBUG, logger="web3_multi_provider"):
+            await w3.eth.get_block("latest")
+            await w3.eth.get_block("latest")
 
-        # Make sure there is no inf recursion
-        assert len(self._caplog.records) == 6
+        not_responding = {
+            "msg": "Provider not responding.",
+            "error": "Mocked connection error.",
+        }
+        request_sent = {
+            "msg": f"Send request using {provider_class.__name__}.",
+            "method": "eth_getBlockByNumber",
+            "params": "('latest', False)",
+        }
+        messages = [record.msg for record in self._caplog.records]
 
-    async def one_provider_works(self, provider_class):
-        provider = provider_class(
+        assert messages[:2] == [not_responding, request_sent]
+        assert messages[-1] == request_sent
+        # AsyncMultiProvider sends the second request directly to the second endpoint,
+        # AsyncFallbackProvider starts from the first one again
+        assert make_post_request.call_count == call_count
+
+    @pytest.mark.asyncio
+    async def test_nothing_works(self, make_post_request):
+        provider = AsyncMultiProvider(
             [
                 "http://127.0.0.1:9001",
-                "http://127.0.0.1:9000",
+                "http://127.0.0.1:9002",
             ]
         )
 
         w3 = AsyncWeb3(provider)
 
-        with self._caplog.at_level(logging.DEBUG):
-            await w3.eth.get_block("latest")
-            await w3.eth.get_block("latest")
+        with self._caplog.at_level(logging.DEBUG, logger="web3_multi_provider"):
+            with pytest.raises(NoActiveProviderError):
+                await w3.eth.get_block("latest")
 
-        assert self._caplog.records[2].msg == {
+        not_responding = {
             "msg": "Provider not responding.",
             "error": "Mocked connection error.",
         }
+        # Make sure there is no inf recursion
+        assert [record.msg for record in self._caplog.records] == [
+            not_responding,
+            not_responding,
+            {"msg": "No active provider available."},
+        ]
 
-        assert self._caplog.records[5].msg == {
-            "msg": "Send request using AsyncMultiProvider.",
-            "method": "eth_getBlockByNumber",
-            "params": "('latest', False)",
-        }
-
-        # Make sure second request will be directory to second provider and will ignore second one
-        assert self._caplog.records[9].msg == {
-            "msg": "Send request using AsyncMultiProvider.",
-            "method": "eth_getBlockByNumber",
-            "params": "('latest', False)",
-        }
+    def test_base_provider_is_abstract(self):
+        with pytest.raises(TypeError):
+            AsyncBaseMultiProvider(["http://127.0.0.1:9000"])
 
     def test_protocols_support(self):
         AsyncMultiProvider(["http://127.0.0.1:9001"])
@@ -98,17 +121,21 @@ class TestHttpProvider:
         with pytest.raises(ProtocolNotSupported):
             AsyncMultiProvider(["wss://127.0.0.1:9001"])
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.async_make_post_request",
-        side_effect=mocked_async_request_poa,
-    )
+        with pytest.raises(ProtocolNotSupported):
+            AsyncMultiProvider(["httpx://127.0.0.1:9001"])
+
+        with pytest.raises(ProtocolNotSupported):
+            AsyncMultiProvider(["http://127.0.0.1:9000", "ws://127.0.0.1:9001"])
+
     @pytest.mark.asyncio
     async def test_poa_blockchain(self, make_post_request):
+        make_post_request.side_effect = mocked_request_poa
+
         provider = AsyncMultiProvider(["http://127.0.0.1:9000"])
 
         w3 = AsyncWeb3(provider)
 
-        with self._caplog.at_level(logging.DEBUG):
+        with self._caplog.at_level(logging.DEBUG, logger="web3_multi_provider"):
             block = await w3.eth.get_block("latest")
 
         assert {"msg": "PoA blockchain cleanup response."} in [
@@ -116,17 +143,13 @@ class TestHttpProvider:
         ]
         assert block.get("proofOfAuthorityData") is not None
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.async_make_post_request",
-        side_effect=mocked_async_request_get,
-    )
     @pytest.mark.asyncio
     async def test_pos_blockchain(self, make_post_request):
         provider = AsyncMultiProvider(["http://127.0.0.1:9000"])
 
         w3 = AsyncWeb3(provider)
 
-        with self._caplog.at_level(logging.DEBUG):
+        with self._caplog.at_level(logging.DEBUG, logger="web3_multi_provider"):
             block = await w3.eth.get_block("latest")
 
         assert {"msg": "PoA blockchain cleanup response."} not in [
@@ -134,6 +157,186 @@ class TestHttpProvider:
         ]
         assert block.get("proofOfAuthorityData") is None
 
+    @pytest.mark.parametrize(
+        "provider_class", [AsyncMultiProvider, AsyncFallbackProvider]
+    )
+    @pytest.mark.asyncio
+    async def test_request_caching(self, make_post_request: Mock, provider_class):
+        provider = provider_class(
+            [
+                "http://127.0.0.1:9001",
+                "http://127.0.0.1:9000",
+            ],
+            exception_retry_configuration=None,
+            cache_allowed_requests=True,
+            request_cache_validation_threshold=None,
+        )
+
+        w3 = AsyncWeb3(provider)
+        await w3.eth.get_block(1)
+        await w3.eth.get_block(1)
+
+        # Second request is served from the cache, no endpoint is queried
+        assert make_post_request.call_count == 2
+        assert not provider._providers[0].cache_allowed_requests
+
+    @pytest.mark.parametrize(
+        "provider_class", [AsyncMultiProvider, AsyncFallbackProvider]
+    )
+    @pytest.mark.parametrize(
+        "endpoint_urls",
+        [
+            ["http://127.0.0.1:9000", "http://127.0.0.1:9001"],
+            ["http://127.0.0.1:9001", "http://127.0.0.1:9000"],
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_request_caching_default_threshold(
+        self, make_post_request: Mock, provider_class, endpoint_urls
+    ):
+        make_post_request.side_effect = mocked_mainnet_request_get
+        provider = provider_class(
+            endpoint_urls,
+            exception_retry_configuration=None,
+            cache_allowed_requests=True,
+        )
+
+        w3 = AsyncWeb3(provider)
+        await w3.eth.get_block(1)
+        call_count = make_post_request.call_count
+        await w3.eth.get_block(1)
+
+        # Validation probes go through the fallback loop to the working endpoint
+        assert [
+            json.loads(call.args[1])["method"]
+            for call in make_post_request.call_args_list
+            if call.args[0] == "http://127.0.0.1:9000"
+        ] == ["eth_getBlockByNumber", "eth_chainId", "eth_getBlockByNumber"]
+        assert (
+            provider.request_cache_validation_threshold
+            is RequestCacheValidationThreshold.FINALIZED
+        )
+        assert make_post_request.call_count == call_count
+
+    @pytest.mark.parametrize(
+        "provider_class", [AsyncMultiProvider, AsyncFallbackProvider]
+    )
+    @pytest.mark.asyncio
+    async def test_batch_request(self, make_post_request: Mock, provider_class):
+        make_post_request.side_effect = mocked_batch_request_get
+
+        w3 = AsyncWeb3(
+            provider_class(
+                [
+                    "http://127.0.0.1:9001",
+                    "http://127.0.0.1:9000",
+                ],
+                exception_retry_configuration=None,
+            )
+        )
+
+        async with w3.batch_requests() as batch:
+            batch.add(w3.eth.get_block(1))
+            batch.add(w3.eth.get_block(2))
+            blocks = await batch.async_execute()
+
+        # Whole batch is sent as a single request to the working endpoint
+        assert len(blocks) == 2
+        assert make_post_request.call_count == 2
+        assert make_post_request.call_args.args[0] == "http://127.0.0.1:9000"
+
+    @pytest.mark.asyncio
+    async def test_shared_async_session(self):
+        provider = AsyncMultiProvider(
+            [
+                "http://127.0.0.1:9001",
+                "http://127.0.0.1:9000",
+            ]
+        )
+        session = ClientSession(connector=TCPConnector(limit_per_host=32))
+
+        assert await provider.cache_async_session(session) is session
+        for child in provider._providers:
+            manager = child._request_session_manager
+            cached = await manager.async_cache_and_return_session(child.endpoint_uri)
+            assert cached is session
+
+        await provider.disconnect()
+        assert session.closed
+
+    @pytest.mark.asyncio
+    async def test_shared_async_session_after_first_request(self):
+        provider = AsyncMultiProvider(
+            [
+                "http://127.0.0.1:9001",
+                "http://127.0.0.1:9000",
+            ]
+        )
+        # Default sessions are cached by the first request
+        for child in provider._providers:
+            manager = child._request_session_manager
+            await manager.async_cache_and_return_session(child.endpoint_uri)
+
+        session = ClientSession(connector=TCPConnector(limit_per_host=32))
+
+        with pytest.raises(RuntimeError):
+            await provider.cache_async_session(session)
+
+        await session.close()
+        await provider.disconnect()
+
+    @pytest.mark.asyncio
+    async def test_shared_async_session_failure_changes_nothing(self):
+        provider = AsyncMultiProvider(
+            [
+                "http://127.0.0.1:9001",
+                "http://127.0.0.1:9000",
+            ]
+        )
+        first, second = (
+            child._request_session_manager for child in provider._providers
+        )
+        # Only the second endpoint has served a request
+        default = await second.async_cache_and_return_session(
+            provider._providers[1].endpoint_uri
+        )
+
+        session = ClientSession(connector=TCPConnector(limit_per_host=32))
+
+        with pytest.raises(RuntimeError):
+            await provider.cache_async_session(session)
+
+        assert len(first.session_cache) == 0
+        assert [entry for _, entry in second.session_cache.items()] == [default]
+
+        await session.close()
+        await provider.disconnect()
+
+    @pytest.mark.parametrize(
+        "provider_class", [AsyncMultiProvider, AsyncFallbackProvider]
+    )
+    @pytest.mark.asyncio
+    async def test_cancellation_is_not_swallowed(
+        self, make_post_request: Mock, provider_class
+    ):
+        make_post_request.side_effect = asyncio.CancelledError
+
+        w3 = AsyncWeb3(
+            provider_class(
+                [
+                    "http://127.0.0.1:9000",
+                    "http://127.0.0.1:9001",
+                ],
+                exception_retry_configuration=None,
+            )
+        )
+
+        with pytest.raises(asyncio.CancelledError):
+            await w3.eth.get_block("latest")
+
+        # Cancelled request must not fall back to the next endpoint
+        make_post_request.assert_called_once()
+
 
 class TestAsyncFallbackProvider:
     @pytest.mark.asyncio
@@ -143,10 +346,6 @@ class TestAsyncFallbackProvider:
         with pytest.raises(NoActiveProviderError):
             await w3.eth.get_block("latest")
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.async_make_post_request",
-        side_effect=mocked_async_request_get,
-    )
     @pytest.mark.asyncio
     async def test_one_endpoint(self, make_post_request: Mock):
         w3 = AsyncWeb3(
@@ -160,10 +359,6 @@ class TestAsyncFallbackProvider:
         await w3.eth.get_block("latest")
         make_post_request.assert_called_once()
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.async_make_post_request",
-        side_effect=mocked_async_request_get,
-    )
     @pytest.mark.asyncio
     async def test_first_working(self, make_post_request: Mock):
         w3 = AsyncWeb3(
@@ -179,10 +374,6 @@ class TestAsyncFallbackProvider:
         make_post_request.assert_called_once()
         assert make_post_request.call_args.args[0] == "http://127.0.0.1:9000"
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.async_make_post_request",
-        side_effect=mocked_async_request_get,
-    )
     @pytest.mark.asyncio
     async def test_all_endpoints_fail(self, make_post_request: Mock):
         w3 = AsyncWeb3(
@@ -202,10 +393,6 @@ class TestAsyncFallbackProvider:
         assert make_post_request.call_count == 3
         assert make_post_request.call_args.args[0] == "http://127.0.0.1:9003"
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.async_make_post_request",
-        side_effect=mocked_async_request_get,
-    )
     @pytest.mark.asyncio
     async def test_one_endpoint_works(self, make_post_request: Mock):
         w3 = AsyncWeb3(
@@ -222,10 +409,6 @@ class TestAsyncFallbackProvider:
         assert make_post_request.call_count == 2
         assert make_post_request.call_args.args[0] == "http://127.0.0.1:9000"
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.async_make_post_request",
-        side_effect=mocked_async_request_get,
-    )
     @pytest.mark.asyncio
     async def test_starts_from_the_first(self, make_post_request: Mock):
         w3 = AsyncWeb3(
@@ -243,3 +426,249 @@ class TestAsyncFallbackProvider:
 
         assert make_post_request.call_count == 4
         assert make_post_request.call_args_list[-2].args[0] == "http://127.0.0.1:9001"
+
+    @pytest.mark.asyncio
+    async def test_latency_strategy_prefers_working_endpoint(
+        self, make_post_request: Mock
+    ):
+        w3 = AsyncWeb3(
+            AsyncFallbackProvider(
+                [
+                    "http://127.0.0.1:9001",
+                    "http://127.0.0.1:9000",
+                ],
+                exception_retry_configuration=None,
+                strategy="latency",
+            )
+        )
+
+        await w3.eth.get_block("latest")
+        await w3.eth.get_block("latest")
+
+        # Failed endpoint is moved to the end after the first request
+        assert make_post_request.call_count == 3
+        assert make_post_request.call_args.args[0] == "http://127.0.0.1:9000"
+
+    def test_unknown_strategy(self):
+        with pytest.raises(ValueError):
+            AsyncFallbackProvider(["http://127.0.0.1:9000"], strategy="random")
+
+    @pytest.mark.asyncio
+    async def test_cooldown_skips_failed_endpoint(self, make_post_request: Mock):
+        w3 = AsyncWeb3(
+            AsyncFallbackProvider(
+                [
+                    "http://127.0.0.1:9001",
+                    "http://127.0.0.1:9000",
+                ],
+                exception_retry_configuration=None,
+                cooldown=60,
+            )
+        )
+
+        await w3.eth.get_block("latest")
+        await w3.eth.get_block("latest")
+
+        assert make_post_request.call_count == 3
+        assert make_post_request.call_args.args[0] == "http://127.0.0.1:9000"
+
+    @pytest.mark.asyncio
+    async def test_cooldown_all_endpoints_fail(self, make_post_request: Mock):
+        w3 = AsyncWeb3(
+            AsyncFallbackProvider(
+                [
+                    "http://127.0.0.1:9001",
+                    "http://127.0.0.1:9002",
+                ],
+                exception_retry_configuration=None,
+                cooldown=60,
+            )
+        )
+
+        for _ in range(2):
+            with pytest.raises(NoActiveProviderError):
+                await w3.eth.get_block("latest")
+
+        # Endpoints in cooldown are still tried when nothing else is left
+        assert make_post_request.call_count == 4
+
+    @pytest.mark.asyncio
+    async def test_hedged_request(self, make_post_request: Mock):
+        async def slow_first_endpoint(endpoint_uri, data, *args, **kwargs):
+            if endpoint_uri == "http://127.0.0.1:9001":
+                await asyncio.sleep(10)
+            return mocked_request_get("http://127.0.0.1:9000", data)
+
+        make_post_request.side_effect = slow_first_endpoint
+
+        w3 = AsyncWeb3(
+            AsyncFallbackProvider(
+                [
+                    "http://127.0.0.1:9001",
+                    "http://127.0.0.1:9000",
+                ],
+                exception_retry_configuration=None,
+                hedge_after=0.01,
+            )
+        )
+
+        # Second endpoint is queried without waiting for the first one to fail
+        await asyncio.wait_for(w3.eth.get_block("latest"), timeout=1)
+        assert make_post_request.call_count == 2
+        assert make_post_request.call_args.args[0] == "http://127.0.0.1:9000"
+
+    @pytest.mark.asyncio
+    async def test_hedged_request_latency_strategy(self, make_post_request: Mock):
+        async def slow_first_endpoint(endpoint_uri, data, *args, **kwargs):
+            if endpoint_uri == "http://127.0.0.1:9001":
+                await asyncio.sleep(10)
+            return mocked_request_get("http://127.0.0.1:9000", data)
+
+        make_post_request.side_effect = slow_first_endpoint
+
+        provider = AsyncFallbackProvider(
+            [
+                "http://127.0.0.1:9001",
+                "http://127.0.0.1:9000",
+            ],
+            exception_retry_configuration=None,
+            strategy="latency",
+            hedge_after=0.01,
+        )
+        w3 = AsyncWeb3(provider)
+
+        for _ in range(3):
+            await asyncio.wait_for(w3.eth.get_block("latest"), timeout=1)
+
+        # Cancelled hedge still counts as a slow response,
+        # so next requests start from the faster endpoint
+        assert provider._stats[0].latency >= 0.01
+        assert make_post_request.call_count == 4
+        assert make_post_request.call_args.args[0] == "http://127.0.0.1:9000"
+
+    @pytest.mark.asyncio
+    async def test_transactions_are_not_hedged(self, make_post_request: Mock):
+        def slow_first_endpoint(mocked_response):
+            async def side_effect(endpoint_uri, data, *args, **kwargs):
+                if endpoint_uri == "http://127.0.0.1:9001":
+                    await asyncio.sleep(0.05)
+                return mocked_response("http://127.0.0.1:9000", data)
+
+            return side_effect
+
+        provider = AsyncFallbackProvider(
+            [
+                "http://127.0.0.1:9001",
+                "http://127.0.0.1:9000",
+            ],
+            exception_retry_configuration=None,
+            hedge_after=0.01,
+        )
+
+        make_post_request.side_effect = slow_first_endpoint(mocked_request_get)
+        await provider.make_request(RPC.eth_sendRawTransaction, ["0x00"])
+
+        make_post_request.side_effect = slow_first_endpoint(mocked_batch_request_get)
+        await provider.make_batch_request(
+            [
+                (RPC.eth_blockNumber, []),
+                (RPC.eth_sendRawTransaction, ["0x00"]),
+            ]
+        )
+
+        # Transactions wait for the first endpoint instead of being sent twice
+        assert [call.args[0] for call in make_post_request.call_args_list] == [
+            "http://127.0.0.1:9001",
+            "http://127.0.0.1:9001",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_hedged_request_failure_is_logged(
+        self, make_post_request: Mock, caplog
+    ):
+        released = asyncio.Event()
+
+        async def failing_first_endpoint(endpoint_uri, data, *args, **kwargs):
+            if endpoint_uri == "http://127.0.0.1:9001":
+                await released.wait()
+                raise ConnectionError("Mocked connection error.")
+            # First endpoint fails while the second one is finishing
+            released.set()
+            return mocked_request_get(endpoint_uri, data)
+
+        make_post_request.side_effect = failing_first_endpoint
+
+        w3 = AsyncWeb3(
+            AsyncFallbackProvider(
+                [
+                    "http://127.0.0.1:9001",
+                    "http://127.0.0.1:9000",
+                ],
+                exception_retry_configuration=None,
+                hedge_after=0.01,
+            )
+        )
+
+        with caplog.at_level(logging.WARNING, logger="web3_multi_provider"):
+            await asyncio.wait_for(w3.eth.get_block("latest"), timeout=1)
+
+        assert [record.msg for record in caplog.records] == [
+            {"msg": "Provider not responding.", "error": "Mocked connection error."}
+        ]
+
+    @pytest.mark.asyncio
+    async def test_hedged_request_failover(self, make_post_request: Mock):
+        w3 = AsyncWeb3(
+            AsyncFallbackProvider(
+                [
+                    "http://127.0.0.1:9001",
+                    "http://127.0.0.1:9002",
+                    "http://127.0.0.1:9000",
+                ],
+                exception_retry_configuration=None,
+                hedge_after=10,
+            )
+        )
+
+        # Failed endpoints are replaced immediately, not after the hedge budget
+        await asyncio.wait_for(w3.eth.get_block("latest"), timeout=1)
+        assert make_post_request.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_healthcheck(self, make_post_request: Mock):
+        provider = AsyncFallbackProvider(
+            [
+                "http://127.0.0.1:9001",
+                "http://127.0.0.1:9000",
+            ],
+            exception_retry_configuration=None,
+            cooldown=60,
+        )
+
+        assert await provider.healthcheck() == [False, True]
+        assert make_post_request.call_count == 2
+
+        # Endpoint that failed the healthcheck is in cooldown
+        await AsyncWeb3(provider).eth.get_block("latest")
+        assert make_post_request.call_count == 3
+        assert make_post_request.call_args.args[0] == "http://127.0.0.1:9000"
+
+    @pytest.mark.asyncio
+    async def test_request_ids_are_unique(self, make_post_request: Mock):
+        w3 = AsyncWeb3(
+            AsyncFallbackProvider(
+                [
+                    "http://127.0.0.1:9001",
+                    "http://127.0.0.1:9000",
+                ],
+                exception_retry_configuration=None,
+            )
+        )
+        await w3.eth.get_block("latest")
+        await w3.eth.get_block("latest")
+
+        # All endpoints take ids from the same counter
+        ids = [
+            json.loads(call.args[1])["id"] for call in make_post_request.call_args_list
+        ]
+        assert ids == [0, 1, 2, 3]
@@ -1,147 +1,234 @@
+import json
 import logging
-from unittest import TestCase
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch
 
 import pytest
 from web3 import Web3
+from web3.utils import RequestCacheValidationThreshold
 
-from tests.mocked_requests import mocked_request_get, mocked_request_poa
+from tests.mocked_requests import (
+    mocked_batch_request_get,
+    mocked_mainnet_request_get,
+    mocked_request_get,
+    mocked_request_poa,
+)
 from web3_multi_provider import MultiProvider
 from web3_multi_provider.multi_http_provider import (
+    BaseMultiProvider,
     FallbackProvider,
     NoActiveProviderError,
     ProtocolNotSupported,
 )
 
 
-class HttpProviderTestCase(TestCase):
+@pytest.fixture
+def make_post_request():
+    with patch(
+        "web3._utils.http_session_manager.HTTPSessionManager.make_post_request",
+        side_effect=mocked_request_get,
+    ) as mock:
+        yield mock
+
+
+class TestHttpProvider:
+    _caplog = None
+
     @pytest.fixture(autouse=True)
     def __inject_fixtures(self, caplog):
         self._caplog = caplog
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.make_post_request",
-        side_effect=mocked_request_get,
-    )
-    def test_one_provider_works(self, make_post_request):
-        self.one_provider_works(MultiProvider)
-        self.one_provider_works(FallbackProvider)
-
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.make_post_request",
-        side_effect=mocked_request_get,
+    @pytest.mark.parametrize(
+        "provider_class, call_count", [(MultiProvider, 3), (FallbackProvider, 4)]
     )
-    def test_nothing_works(self, make_post_request):
-        self._caplog.set_level(logging.WARNING)
-
-        provider = MultiProvider(
+    def test_one_provider_works(self, make_post_request, provider_class, call_count):
+        provider = provider_class(
             [
                 "http://127.0.0.1:9001",
-                "http://127.0.0.1:9002",
+                "http://127.0.0.1:9000",
             ],
             exception_retry_configuration=None,
         )
 
         w3 = Web3(provider)
 
-        with self._caplog.at_level(logging.DEBUG):
-            with self.assertRaises(NoActiveProviderError):
-                w3.eth.get_block("latest")
+        with self._caplog.at_level(logging.DEBUG, logger="web3_multi_provider"):
+            w3.eth.get_block("latest")
+            w3.eth.get_block("latest")
 
-        # Make sure there is no inf recursion
-        self.assertEqual(len(self._caplog.records), 6)
+        not_responding = {
+            "msg": "Provider not responding.",
+            "error": "Mocked connection error.",
+        }
+        request_sent = {
+            "msg": f"Send request using {provider_class.__name__}.",
+            "method": "eth_getBlockByNumber",
+            "params": "('latest', False)",
+        }
+        messages = [record.msg for record in self._caplog.records]
+
+        assert messages[:2] == [not_responding, request_sent]
+        assert messages[-1] == request_sent
+        # MultiProvider sends the second request directly to the second endpoint,
+        # FallbackProvider starts from the first one again
+        assert make_post_request.call_count == call_count
 
-    def one_provider_works(self, provider_class):
-        provider = provider_class(
+    def test_nothing_works(self, make_post_request):
+        provider = MultiProvider(
             [
                 "http://127.0.0.1:9001",
-                "http://127.0.0.1:9000",
+                "http://127.0.0.1:9002",
             ],
             exception_retry_configuration=None,
         )
 
         w3 = Web3(provider)
 
-        with self._caplog.at_level(logging.DEBUG):
-            w3.eth.get_block("latest")
-            w3.eth.get_block("latest")
+        with self._caplog.at_level(logging.DEBUG, logger="web3_multi_provider"):
+            with pytest.raises(NoActiveProviderError):
+                w3.eth.get_block("latest")
 
-        self.assertDictEqual(
-            {
-                "msg": "Provider not responding.",
-                "error": "Mocked connection error.",
-            },
-            self._caplog.records[2].msg,
-        )
-        self.assertDictEqual(
-            {
-                "msg": "Send request using MultiProvider.",
-                "method": "eth_getBlockByNumber",
-                "params": "('latest', False)",
-            },
-            self._caplog.records[5].msg,
-        )
-        # Make sure second request will be directory to second provider and will ignore second one
-        self.assertDictEqual(
-            {
-                "msg": "Send request using MultiProvider.",
-                "method": "eth_getBlockByNumber",
-                "params": "('latest', False)",
-            },
-            self._caplog.records[9].msg,
-        )
+        not_responding = {
+            "msg": "Provider not responding.",
+            "error": "Mocked connection error.",
+        }
+        # Make sure there is no inf recursion
+        assert [record.msg for record in self._caplog.records] == [
+            not_responding,
+            not_responding,
+            {"msg": "No active provider available."},
+        ]
+
+    def test_base_provider_is_abstract(self):
+        with pytest.raises(TypeError):
+            BaseMultiProvider(["http://127.0.0.1:9000"])
 
     def test_protocols_support(self):
         MultiProvider(["http://127.0.0.1:9001"])
         MultiProvider(["https://127.0.0.1:9001"])
 
-        with self.assertRaises(ProtocolNotSupported):
+        with pytest.raises(ProtocolNotSupported):
             MultiProvider(["ipc://127.0.0.1:9001"])
 
-        with self.assertRaises(ProtocolNotSupported):
+        with pytest.raises(ProtocolNotSupported):
             MultiProvider(["ws://127.0.0.1:9001"])
 
-        with self.assertRaises(ProtocolNotSupported):
+        with pytest.raises(ProtocolNotSupported):
             MultiProvider(["wss://127.0.0.1:9001"])
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.make_post_request",
-        side_effect=mocked_request_poa,
-    )
+        with pytest.raises(ProtocolNotSupported):
+            MultiProvider(["httpx://127.0.0.1:9001"])
+
+        with pytest.raises(ProtocolNotSupported):
+            MultiProvider(["http://127.0.0.1:9001", "ws://127.0.0.1:9001"])
+
     def test_poa_blockchain(self, make_post_request):
+        make_post_request.side_effect = mocked_request_poa
+
         provider = MultiProvider(["http://127.0.0.1:9000"])
 
         w3 = Web3(provider)
 
-        with self._caplog.at_level(logging.DEBUG):
+        with self._caplog.at_level(logging.DEBUG, logger="web3_multi_provider"):
             block = w3.eth.get_block("latest")
 
-        self.assertIn(
-            {"msg": "PoA blockchain cleanup response."},
-            [log.msg for log in self._caplog.records],
-        )
-
-        self.assertIsNotNone(block.get("proofOfAuthorityData", None))
+        assert {"msg": "PoA blockchain cleanup response."} in [
+            log.msg for log in self._caplog.records
+        ]
+        assert block.get("proofOfAuthorityData") is not None
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.make_post_request",
-        side_effect=mocked_request_get,
-    )
     def test_pos_blockchain(self, make_post_request):
         provider = MultiProvider(["http://127.0.0.1:9000"])
 
         w3 = Web3(provider)
 
-        with self._caplog.at_level(logging.DEBUG):
+        with self._caplog.at_level(logging.DEBUG, logger="web3_multi_provider"):
             block = w3.eth.get_block("latest")
 
-        self.assertIsNone(block.get("proofOfAuthorityData", None))
+        assert block.get("proofOfAuthorityData") is None
+        assert {"msg": "PoA blockchain cleanup response."} not in [
+            log.msg for log in self._caplog.records
+        ]
+
+    @pytest.mark.parametrize("provider_class", [MultiProvider, FallbackProvider])
+    def test_request_caching(self, make_post_request: Mock, provider_class):
+        provider = provider_class(
+            [
+                "http://127.0.0.1:9001",
+                "http://127.0.0.1:9000",
+            ],
+            exception_retry_configuration=None,
+            cache_allowed_requests=True,
+            request_cache_validation_threshold=None,
+        )
+
+        w3 = Web3(provider)
+        w3.eth.get_block(1)
+        w3.eth.get_block(1)
 
-        self.assertNotIn(
-            {"msg": "PoA blockchain cleanup response."},
-            [log.msg for log in self._caplog.records],
+        # Second request is served from the cache, no endpoint is queried
+        assert make_post_request.call_count == 2
+        assert not provider._providers[0].cache_allowed_requests
+
+    @pytest.mark.parametrize("provider_class", [MultiProvider, FallbackProvider])
+    @pytest.mark.parametrize(
+        "endpoint_urls",
+        [
+            ["http://127.0.0.1:9000", "http://127.0.0.1:9001"],
+            ["http://127.0.0.1:9001", "http://127.0.0.1:9000"],
+        ],
+    )
+    def test_request_caching_default_threshold(
+        self, make_post_request: Mock, provider_class, endpoint_urls
+    ):
+        make_post_request.side_effect = mocked_mainnet_request_get
+        provider = provider_class(
+            endpoint_urls,
+            exception_retry_configuration=None,
+            cache_allowed_requests=True,
+        )
+
+        w3 = Web3(provider)
+        w3.eth.get_block(1)
+        call_count = make_post_request.call_count
+        w3.eth.get_block(1)
+
+        # Validation probes go through the fallback loop to the working endpoint
+        assert [
+            json.loads(call.args[1])["method"]
+            for call in make_post_request.call_args_list
+            if call.args[0] == "http://127.0.0.1:9000"
+        ] == ["eth_getBlockByNumber", "eth_chainId", "eth_getBlockByNumber"]
+        assert (
+            provider.request_cache_validation_threshold
+            is RequestCacheValidationThreshold.FINALIZED
+        )
+        assert make_post_request.call_count == call_count
+
+    @pytest.mark.parametrize("provider_class", [MultiProvider, FallbackProvider])
+    def test_batch_request(self, make_post_request: Mock, provider_class):
+        make_post_request.side_effect = mocked_batch_request_get
+
+        w3 = Web3(
+            provider_class(
+                [
+                    "http://127.0.0.1:9001",
+                    "http://127.0.0.1:9000",
+                ],
+                exception_retry_configuration=None,
+            )
         )
 
+        with w3.batch_requests() as batch:
+            batch.add(w3.eth.get_block(1))
+            batch.add(w3.eth.get_block(2))
+            blocks = batch.execute()
+
+        # Whole batch is sent as a single request to the working endpoint
+        assert len(blocks) == 2
+        assert make_post_request.call_count == 2
+        assert make_post_request.call_args.args[0] == "http://127.0.0.1:9000"
+
 
 class TestFallbackProvider:
     def test_no_endpoints(self):
@@ -150,10 +237,6 @@ class TestFallbackProvider:
         with pytest.raises(NoActiveProviderError):
             w3.eth.get_block("latest")
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.make_post_request",
-        side_effect=mocked_request_get,
-    )
     def test_one_endpoint(self, make_post_request: Mock):
         w3 = Web3(
             FallbackProvider(
@@ -166,10 +249,6 @@ class TestFallbackProvider:
         w3.eth.get_block("latest")
         make_post_request.assert_called_once()
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.make_post_request",
-        side_effect=mocked_request_get,
-    )
     def test_first_working(self, make_post_request: Mock):
         w3 = Web3(
             FallbackProvider(
@@ -184,10 +263,6 @@ class TestFallbackProvider:
         make_post_request.assert_called_once()
         assert make_post_request.call_args.args[0] == "http://127.0.0.1:9000"
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.make_post_request",
-        side_effect=mocked_request_get,
-    )
     def test_all_endpoints_fail(self, make_post_request: Mock):
         w3 = Web3(
             FallbackProvider(
@@ -206,10 +281,6 @@ class TestFallbackProvider:
         assert make_post_request.call_count == 3
         assert make_post_request.call_args.args[0] == "http://127.0.0.1:9003"
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.make_post_request",
-        side_effect=mocked_request_get,
-    )
     def test_one_endpoint_works(self, make_post_request: Mock):
         w3 = Web3(
             FallbackProvider(
@@ -225,10 +296,6 @@ class TestFallbackProvider:
         assert make_post_request.call_count == 2
         assert make_post_request.call_args.args[0] == "http://127.0.0.1:9000"
 
-    @patch(
-        "web3._utils.http_session_manager.HTTPSessionManager.make_post_request",
-        side_effect=mocked_request_get,
-    )
     def test_starts_from_the_first(self, make_post_request: Mock):
         w3 = Web3(
             FallbackProvider(
@@ -245,3 +312,138 @@ class TestFallbackProvider:
 
         assert make_post_request.call_count == 4
         assert make_post_request.call_args_list[-2].args[0] == "http://127.0.0.1:9001"
+
+    def test_latency_strategy_prefers_working_endpoint(self, make_post_request: Mock):
+        w3 = Web3(
+            FallbackProvider(
+                [
+                    "http://127.0.0.1:9001",
+                    "http://127.0.0.1:9000",
+                ],
+                exception_retry_configuration=None,
+                strategy="latency",
+            )
+        )
+
+        w3.eth.get_block("latest")
+        w3.eth.get_block("latest")
+
+        # Failed endpoint is moved to the end after the first request
+        assert make_post_request.call_count == 3
+        assert make_post_request.call_args.args[0] == "http://127.0.0.1:9000"
+
+    def test_unknown_strategy(self):
+        with pytest.raises(ValueError):
+            FallbackProvider(["http://127.0.0.1:9000"], strategy="random")
+
+    def test_latency_strategy_shared_by_threads(self, make_post_request: Mock):
+        provider = FallbackProvider(
+            [
+                "http://127.0.0.1:9001",
+                "http://127.0.0.1:9000",
+            ],
+            exception_retry_configuration=None,
+            strategy="latency",
+        )
+        w3 = Web3(provider)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: w3.eth.get_block("latest"), range(200)))
+
+        # No in-flight update is lost between threads
+        assert [stats.in_flight for stats in provider._stats] == [0, 0]
+
+    def test_cooldown_skips_failed_endpoint(self, make_post_request: Mock):
+        w3 = Web3(
+            FallbackProvider(
+                [
+                    "http://127.0.0.1:9001",
+                    "http://127.0.0.1:9000",
+                ],
+                exception_retry_configuration=None,
+                cooldown=60,
+            )
+        )
+
+        w3.eth.get_block("latest")
+        w3.eth.get_block("latest")
+
+        assert make_post_request.call_count == 3
+        assert make_post_request.call_args.args[0] == "http://127.0.0.1:9000"
+
+    def test_cooldown_shared_by_threads(self, make_post_request: Mock):
+        provider = FallbackProvider(
+            [
+                "http://127.0.0.1:9001",
+                "http://127.0.0.1:9002",
+            ],
+            exception_retry_configuration=None,
+            cooldown=60,
+        )
+        w3 = Web3(provider)
+
+        def get_block(_):
+            with pytest.raises(NoActiveProviderError):
+                w3.eth.get_block("latest")
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(get_block, range(100)))
+
+        # Every failure counts towards the backoff
+        assert [stats.consecutive_fails for stats in provider._stats] == [100, 100]
+
+    def test_cooldown_all_endpoints_fail(self, make_post_request: Mock):
+        w3 = Web3(
+            FallbackProvider(
+                [
+                    "http://127.0.0.1:9001",
+                    "http://127.0.0.1:9002",
+                ],
+                exception_retry_configuration=None,
+                cooldown=60,
+            )
+        )
+
+        for _ in range(2):
+            with pytest.raises(NoActiveProviderError):
+                w3.eth.get_block("latest")
+
+        # Endpoints in cooldown are still tried when nothing else is left
+        assert make_post_request.call_count == 4
+
+    def test_healthcheck(self, make_post_request: Mock):
+        provider = FallbackProvider(
+            [
+                "http://127.0.0.1:9001",
+                "http://127.0.0.1:9000",
+            ],
+            exception_retry_configuration=None,
+            cooldown=60,
+        )
+
+        assert provider.healthcheck() == [False, True]
+        assert make_post_request.call_count == 2
+
+        # Endpoint that failed the healthcheck is in cooldown
+        Web3(provider).eth.get_block("latest")
+        assert make_post_request.call_count == 3
+        assert make_post_request.call_args.args[0] == "http://127.0.0.1:9000"
+
+    def test_request_ids_are_unique(self, make_post_request: Mock):
+        w3 = Web3(
+            FallbackProvider(
+                [
+                    "http://127.0.0.1:9001",
+                    "http://127.0.0.1:9000",
+                ],
+                exception_retry_configuration=None,
+            )
+        )
+        w3.eth.get_block("latest")
+        w3.eth.get_block("latest")
+
+        # All endpoints take ids from the same counter
+        ids = [
+            json.loads(call.args[1])["id"] for call in make_post_request.call_args_list
+        ]
+        assert ids == [0, 1, 2, 3]
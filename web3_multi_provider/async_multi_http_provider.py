@@ -1,33 +1,66 @@
 # pylint: disable=duplicate-code
+import asyncio
 import logging
-from abc import ABC
-from typing import Any
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Collection, Sequence, TypeVar
+from urllib.parse import urlsplit
 
+from aiohttp import ClientSession
 from eth_typing import URI
 from web3 import AsyncHTTPProvider
+from web3._utils.caching import async_handle_request_caching, generate_cache_key
 from web3._utils.empty import Empty, empty
+from web3._utils.rpc_abi import RPC
 from web3.providers.async_base import AsyncJSONBaseProvider
 from web3.providers.rpc.utils import ExceptionRetryConfiguration
 from web3.types import RPCEndpoint, RPCResponse
+from web3.utils import RequestCacheValidationThreshold
 
+from web3_multi_provider.endpoint_stats import (
+    EndpointStats,
+    available_first,
+    order_by_latency,
+)
 from web3_multi_provider.exceptions import NoActiveProviderError, ProtocolNotSupported
 from web3_multi_provider.poa import sanitize_poa_response
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+SUPPORTED_PROTOCOLS = frozenset({"http", "https"})
+
+NON_IDEMPOTENT_METHODS = frozenset(
+    {RPC.eth_sendRawTransaction, RPC.eth_sendTransaction}
+)
+
+
+def _has_cached_async_session(provider: AsyncHTTPProvider) -> bool:
+    # Same key web3 uses to cache the session of the endpoint for the running loop
+    cache_key = generate_cache_key(
+        f"{id(asyncio.get_event_loop())}:{provider.endpoint_uri}"
+    )
+    manager = provider._request_session_manager  # pylint: disable=protected-access
+    return cache_key in manager.session_cache
+
 
 class AsyncBaseMultiProvider(AsyncJSONBaseProvider, ABC):
     """Base async provider for providers with multiple endpoints"""
 
     _providers: list[AsyncHTTPProvider]
 
-    def __init__(  # pylint: disable=too-many-arguments
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
         self,
         endpoint_urls: list[URI | str],
         request_kwargs: Any | None = None,
         exception_retry_configuration: (
             ExceptionRetryConfiguration | Empty | None
         ) = empty,
+        cache_allowed_requests: bool = False,
+        cacheable_requests: set[RPCEndpoint] | None = None,
+        request_cache_validation_threshold: (
+            RequestCacheValidationThreshold | int | Empty | None
+        ) = empty,
         **kwargs: Any,
     ):
         logger.debug({"msg": f"Initialize {self.__class__.__name__}"})
@@ -37,11 +70,13 @@ class AsyncBaseMultiProvider(AsyncJSONBaseProvider, ABC):
         if endpoint_urls:
             self.endpoint_uri = endpoint_urls[0]
 
+        # Validate the whole list before any provider is created
         for endpoint_uri in endpoint_urls:
-            if not endpoint_uri.startswith("http"):
-                protocol = endpoint_uri.split("://")[0]
+            protocol = urlsplit(endpoint_uri).scheme
+            if protocol not in SUPPORTED_PROTOCOLS:
                 raise ProtocolNotSupported(f'Protocol "{protocol}" is not supported.')
 
+        for endpoint_uri in endpoint_urls:
             self._providers.append(
                 AsyncHTTPProvider(
                     endpoint_uri=endpoint_uri,
@@ -51,7 +86,92 @@ class AsyncBaseMultiProvider(AsyncJSONBaseProvider, ABC):
                 )
             )
 
-        super().__init__()
+        # Responses are cached here rather than in every child provider,
+        # so a cache hit is shared by all endpoints and skips the fallback loop.
+        super().__init__(
+            cache_allowed_requests=cache_allowed_requests,
+            cacheable_requests=cacheable_requests,
+            request_cache_validation_threshold=request_cache_validation_threshold,
+        )
+
+        # Children share one counter, so request ids stay unique across endpoints
+        for provider in self._providers:
+            provider.request_counter = self.request_counter
+
+    async def cache_async_session(self, session: ClientSession) -> ClientSession:
+        """
+        Use one aiohttp session for all endpoints.
+
+        By default web3 creates a session per endpoint whose connector closes the
+        connection after each request. A shared session with a keep-alive
+        connector reuses connections and keeps a single pool for all endpoints.
+
+        Must be called before the first request: web3 keeps the session that is
+        already cached for an endpoint, and RuntimeError is raised in this case.
+        All endpoints are checked first, so a failed call changes nothing.
+        """
+        msg = (
+            "Async session is already cached for some endpoints. "
+            "Call cache_async_session before the first request."
+        )
+        if any(_has_cached_async_session(provider) for provider in self._providers):
+            raise RuntimeError(msg)
+
+        cached = [
+            await provider.cache_async_session(session) for provider in self._providers
+        ]
+        if any(cached_session is not session for cached_session in cached):
+            raise RuntimeError(msg)
+        return session
+
+    async def disconnect(self) -> None:
+        for provider in self._providers:
+            await provider.disconnect()
+
+    @abstractmethod
+    async def _send(
+        self,
+        request: Callable[[AsyncHTTPProvider], Awaitable[T]],
+        methods: Collection[RPCEndpoint],
+    ) -> T:
+        """Send the request with the given RPC methods using the endpoints."""
+
+    @async_handle_request_caching
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        response = await self._send(
+            lambda provider: provider.make_request(method, params), (method,)
+        )
+        sanitize_poa_response(method, response)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                {
+                    "msg": f"Send request using {self.__class__.__name__}.",
+                    "method": method,
+                    "params": str(params),
+                }
+            )
+        return response
+
+    async def make_batch_request(
+        self, requests: list[tuple[RPCEndpoint, Any]]
+    ) -> list[RPCResponse] | RPCResponse:
+        response = await self._send(
+            lambda provider: provider.make_batch_request(requests),
+            [method for method, _ in requests],
+        )
+        if isinstance(response, list):
+            for (method, _), item in zip(requests, response):
+                sanitize_poa_response(method, item)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                {
+                    "msg": f"Send batch request using {self.__class__.__name__}.",
+                    "requests": str(requests),
+                }
+            )
+        return response
 
 
 class AsyncMultiProvider(AsyncBaseMultiProvider):
@@ -61,14 +181,18 @@ class AsyncMultiProvider(AsyncBaseMultiProvider):
 
     _current_provider_index: int = 0
 
-    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+    async def _send(
+        self,
+        request: Callable[[AsyncHTTPProvider], Awaitable[T]],
+        methods: Collection[RPCEndpoint],
+    ) -> T:
         providers_count = len(self._providers)
 
         for _ in range(providers_count):
             active_provider = self._providers[self._current_provider_index]
 
             try:
-                response = await active_provider.make_request(method, params)
+                return await request(active_provider)
             except Exception as error:  # pylint: disable=broad-except
                 self._current_provider_index = (
                     self._current_provider_index + 1
@@ -81,17 +205,6 @@ class AsyncMultiProvider(AsyncBaseMultiProvider):
                         ),
                     }
                 )
-            else:
-                sanitize_poa_response(method, response)
-
-                logger.debug(
-                    {
-                        "msg": "Send request using AsyncMultiProvider.",
-                        "method": method,
-                        "params": str(params),
-                    }
-                )
-                return response
 
         msg = "No active provider available."
         logger.debug({"msg": msg})
@@ -99,31 +212,145 @@ class AsyncMultiProvider(AsyncBaseMultiProvider):
 
 
 class AsyncFallbackProvider(AsyncBaseMultiProvider):
-    """Basic fallback provider"""
+    """
+    Provider that sends request to the endpoints one by one until response received.
 
-    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
-        for provider in self._providers:
+    By default endpoints are tried in the order they were passed. With
+    strategy="latency" they are ordered by failures and Peak-EWMA latency instead.
+    With cooldown > 0 a failed endpoint is skipped for cooldown seconds, doubled
+    on every consecutive failure up to max_cooldown.
+    With hedge_after set the next endpoint is queried if the current one has not
+    responded within hedge_after seconds, the first response received wins.
+    Requests sending transactions are never hedged.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        endpoint_urls: list[URI | str],
+        *args: Any,
+        strategy: str = "static",
+        latency_decay: float = 10.0,
+        cooldown: float = 0.0,
+        max_cooldown: float = 60.0,
+        hedge_after: float | None = None,
+        **kwargs: Any,
+    ):
+        if strategy not in ("static", "latency"):
+            raise ValueError(f'Strategy "{strategy}" is not supported.')
+
+        super().__init__(endpoint_urls, *args, **kwargs)
+        self._strategy = strategy
+        self._hedge_after = hedge_after
+        self._stats = [
+            EndpointStats(latency_decay, cooldown, max_cooldown)
+            for _ in self._providers
+        ]
+
+    async def _send(
+        self,
+        request: Callable[[AsyncHTTPProvider], Awaitable[T]],
+        methods: Collection[RPCEndpoint],
+    ) -> T:
+        order: Sequence[int] = range(len(self._providers))
+        if self._strategy == "latency":
+            order = order_by_latency(self._stats)
+
+        # Transactions are never broadcast to several endpoints at once
+        if self._hedge_after is not None and NON_IDEMPOTENT_METHODS.isdisjoint(methods):
+            return await self._send_hedged(request, order)
+
+        for index in available_first(self._stats, order):
             try:
-                response = await provider.make_request(method, params)
+                return await self._request(request, index)
             except Exception as error:  # pylint: disable=broad-except
-                logger.warning(
-                    {
-                        "msg": "Provider not responding.",
-                        "error": str(error).replace(str(provider.endpoint_uri), "****"),
-                    }
-                )
-            else:
-                sanitize_poa_response(method, response)
+                self._log_error(error, self._providers[index])
 
-                logger.debug(
-                    {
-                        "msg": "Send request using FallbackProvider.",
-                        "method": method,
-                        "params": str(params),
-                    }
+        msg = "No active provider available."
+        logger.debug({"msg": msg})
+        raise NoActiveProviderError(msg)
+
+    async def _send_hedged(
+        self,
+        request: Callable[[AsyncHTTPProvider], Awaitable[T]],
+        order: Sequence[int],
+    ) -> T:
+        indexes = available_first(self._stats, order)
+        pending: dict[asyncio.Task[T], int] = {}
+
+        try:
+            while True:
+                # Next endpoint is queried when the previous one failed
+                # or has not responded within the hedge budget.
+                index = next(indexes, None)
+                if index is not None:
+                    task = asyncio.create_task(self._request(request, index))
+                    pending[task] = index
+                elif not pending:
+                    break
+
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self._hedge_after if index is not None else None,
+                    return_when=asyncio.FIRST_COMPLETED,
                 )
-                return response
+                # All finished requests are handled, so no failure goes unnoticed
+                winner: asyncio.Task[T] | None = None
+                for task in done:
+                    index = pending.pop(task)
+                    error = task.exception()
+                    if error is not None:
+                        self._log_error(error, self._providers[index])
+                    elif winner is None:
+                        winner = task
+
+                if winner is not None:
+                    return winner.result()
+        finally:
+            # Slower requests are not needed anymore
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
 
         msg = "No active provider available."
         logger.debug({"msg": msg})
         raise NoActiveProviderError(msg)
+
+    async def healthcheck(self) -> list[bool]:
+        """
+        Send eth_chainId to all endpoints concurrently.
+
+        Returns endpoint health in the order endpoints were passed. The results are
+        recorded like regular requests, so failed endpoints are tried last
+        (strategy="latency") or skipped during the cooldown.
+        """
+        return list(
+            await asyncio.gather(
+                *(self._probe(index) for index in range(len(self._providers)))
+            )
+        )
+
+    async def _probe(self, index: int) -> bool:
+        try:
+            await self._request(
+                lambda provider: provider.make_request(RPCEndpoint("eth_chainId"), []),
+                index,
+            )
+        except Exception as error:  # pylint: disable=broad-except
+            self._log_error(error, self._providers[index])
+            return False
+        return True
+
+    async def _request(
+        self, request: Callable[[AsyncHTTPProvider], Awaitable[T]], index: int
+    ) -> T:
+        with self._stats[index].measure():
+            return await request(self._providers[index])
+
+    @staticmethod
+    def _log_error(error: BaseException, provider: AsyncHTTPProvider) -> None:
+        logger.warning(
+            {
+                "msg": "Provider not responding.",
+                "error": str(error).replace(str(provider.endpoint_uri), "****"),
+            }
+        )
@@ -0,0 +1,114 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+
+class EndpointStats:  # pylint: disable=too-many-instance-attributes
+    """
+    Peak-EWMA latency estimate and failure cooldown of a single endpoint.
+
+    Updates are guarded by a lock, so the stats may be shared by threads
+    sending requests through the same sync provider.
+    """
+
+    def __init__(
+        self, decay: float = 10.0, cooldown: float = 0.0, max_cooldown: float = 60.0
+    ):
+        self._decay = decay
+        self._cooldown = cooldown
+        self._max_cooldown = max_cooldown
+        self._updated_at = time.perf_counter()
+        self._lock = threading.Lock()
+
+        self.latency = 0.0
+        self.in_flight = 0
+        self.consecutive_fails = 0
+        self.cooldown_until = 0.0
+
+    @property
+    def sort_key(self) -> tuple[int, float]:
+        """Endpoints with the lowest key are tried first."""
+        return self.consecutive_fails, self.latency * (self.in_flight + 1)
+
+    @property
+    def available(self) -> bool:
+        """Endpoint is not in cooldown after a failure."""
+        # Healthy endpoints have no deadline, so the clock is not read for them
+        return not self.cooldown_until or self.cooldown_until <= time.perf_counter()
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        """Track a request sent to the endpoint."""
+        with self._lock:
+            self.in_flight += 1
+        started_at = time.perf_counter()
+
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                self.in_flight -= 1
+                self._fail()
+            raise
+        except BaseException:
+            # Cancelled (e.g. a hedged request that lost): the endpoint
+            # has been at least this slow, so it must not look idle
+            with self._lock:
+                self.in_flight -= 1
+                self._observe(started_at, lower_bound=True)
+            raise
+
+        with self._lock:
+            self.in_flight -= 1
+            self.consecutive_fails = 0
+            self.cooldown_until = 0.0
+            self._observe(started_at)
+
+    def _fail(self) -> None:
+        self.consecutive_fails += 1
+
+        if self._cooldown:
+            # Exponential backoff: every consecutive failure doubles the cooldown
+            backoff = self._cooldown * 2 ** min(self.consecutive_fails - 1, 16)
+            self.cooldown_until = time.perf_counter() + min(backoff, self._max_cooldown)
+
+    def _observe(self, started_at: float, lower_bound: bool = False) -> None:
+        now = time.perf_counter()
+        latency = now - started_at
+
+        if latency > self.latency:
+            # Peak sensitive: slow responses are taken into account immediately
+            self.latency = latency
+        elif lower_bound:
+            # Unfinished request can only raise the estimate
+            return
+        else:
+            weight = math.exp(-(now - self._updated_at) / self._decay)
+            self.latency = self.latency * weight + latency * (1 - weight)
+
+        self._updated_at = now
+
+
+def order_by_latency(stats: list[EndpointStats]) -> list[int]:
+    """Return endpoint indexes sorted from the best to the worst one."""
+    return sorted(range(len(stats)), key=lambda index: stats[index].sort_key)
+
+
+def available_first(stats: list[EndpointStats], order: Iterable[int]) -> Iterator[int]:
+    """
+    Yield endpoint indexes skipping the ones in cooldown.
+
+    Endpoints in cooldown are yielded last, so they are still tried
+    when none of the available endpoints responded.
+    """
+    cooling = []
+
+    for index in order:
+        if stats[index].available:
+            yield index
+        else:
+            cooling.append(index)
+
+    yield from cooling
@@ -1,26 +1,39 @@
 import logging
-from abc import ABC
-from typing import Any
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Sequence, TypeVar
+from urllib.parse import urlsplit
 
 from eth_typing import URI
 from web3 import HTTPProvider
+from web3._utils.caching import handle_request_caching
 from web3._utils.empty import Empty, empty
 from web3.providers import JSONBaseProvider
 from web3.providers.rpc.utils import ExceptionRetryConfiguration
 from web3.types import RPCEndpoint, RPCResponse
+from web3.utils import RequestCacheValidationThreshold
 
+from web3_multi_provider.endpoint_stats import (
+    EndpointStats,
+    available_first,
+    order_by_latency,
+)
 from web3_multi_provider.exceptions import NoActiveProviderError, ProtocolNotSupported
 from web3_multi_provider.poa import sanitize_poa_response
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+SUPPORTED_PROTOCOLS = frozenset({"http", "https"})
+
 
 class BaseMultiProvider(JSONBaseProvider, ABC):
     """Base provider for providers with multiple endpoints"""
 
     _providers: list[HTTPProvider] = []
 
-    def __init__(  # pylint: disable=too-many-arguments
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
         self,
         endpoint_urls: list[URI | str],
         request_kwargs: Any | None = None,
@@ -28,6 +41,11 @@ class BaseMultiProvider(JSONBaseProvider, ABC):
         exception_retry_configuration: (
             ExceptionRetryConfiguration | Empty | None
         ) = empty,
+        cache_allowed_requests: bool = False,
+        cacheable_requests: set[RPCEndpoint] | None = None,
+        request_cache_validation_threshold: (
+            RequestCacheValidationThreshold | int | Empty | None
+        ) = empty,
         **kwargs: Any,
     ):
         logger.debug({"msg": f"Initialize {self.__class__.__name__}"})
@@ -37,11 +55,13 @@ class BaseMultiProvider(JSONBaseProvider, ABC):
         if endpoint_urls:
             self.endpoint_uri = endpoint_urls[0]
 
+        # Validate the whole list before any provider is created
         for endpoint_uri in endpoint_urls:
-            if not endpoint_uri.startswith("http"):
-                protocol = endpoint_uri.split("://")[0]
+            protocol = urlsplit(endpoint_uri).scheme
+            if protocol not in SUPPORTED_PROTOCOLS:
                 raise ProtocolNotSupported(f'Protocol "{protocol}" is not supported.')
 
+        for endpoint_uri in endpoint_urls:
             self._providers.append(
                 HTTPProvider(
                     endpoint_uri=endpoint_uri,
@@ -52,7 +72,53 @@ class BaseMultiProvider(JSONBaseProvider, ABC):
                 )
             )
 
-        super().__init__()
+        # Responses are cached here rather than in every child provider,
+        # so a cache hit is shared by all endpoints and skips the fallback loop.
+        super().__init__(
+            cache_allowed_requests=cache_allowed_requests,
+            cacheable_requests=cacheable_requests,
+            request_cache_validation_threshold=request_cache_validation_threshold,
+        )
+
+        # Children share one counter, so request ids stay unique across endpoints
+        for provider in self._providers:
+            provider.request_counter = self.request_counter
+
+    @abstractmethod
+    def _send(self, request: Callable[[HTTPProvider], T]) -> T:
+        """Send the request using one or more of the endpoints."""
+
+    @handle_request_caching
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        response = self._send(lambda provider: provider.make_request(method, params))
+        sanitize_poa_response(method, response)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                {
+                    "msg": f"Send request using {self.__class__.__name__}.",
+                    "method": method,
+                    "params": str(params),
+                }
+            )
+        return response
+
+    def make_batch_request(
+        self, requests: list[tuple[RPCEndpoint, Any]]
+    ) -> list[RPCResponse] | RPCResponse:
+        response = self._send(lambda provider: provider.make_batch_request(requests))
+        if isinstance(response, list):
+            for (method, _), item in zip(requests, response):
+                sanitize_poa_response(method, item)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                {
+                    "msg": f"Send batch request using {self.__class__.__name__}.",
+                    "requests": str(requests),
+                }
+            )
+        return response
 
 
 class MultiProvider(BaseMultiProvider):
@@ -62,14 +128,14 @@ class MultiProvider(BaseMultiProvider):
 
     _current_provider_index: int = 0
 
-    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+    def _send(self, request: Callable[[HTTPProvider], T]) -> T:
         providers_count = len(self._providers)
 
         for _ in range(providers_count):
             active_provider = self._providers[self._current_provider_index]
 
             try:
-                response = active_provider.make_request(method, params)
+                return request(active_provider)
             except Exception as error:  # pylint: disable=broad-except
                 self._current_provider_index = (
                     self._current_provider_index + 1
@@ -82,17 +148,6 @@ class MultiProvider(BaseMultiProvider):
                         ),
                     }
                 )
-            else:
-                sanitize_poa_response(method, response)
-
-                logger.debug(
-                    {
-                        "msg": "Send request using MultiProvider.",
-                        "method": method,
-                        "params": str(params),
-                    }
-                )
-                return response
 
         msg = "No active provider available."
         logger.debug({"msg": msg})
@@ -100,31 +155,84 @@ class MultiProvider(BaseMultiProvider):
 
 
 class FallbackProvider(BaseMultiProvider):
-    """Basic fallback provider"""
+    """
+    Provider that sends request to the endpoints one by one until response received.
 
-    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
-        for provider in self._providers:
+    By default endpoints are tried in the order they were passed. With
+    strategy="latency" they are ordered by failures and Peak-EWMA latency instead.
+    With cooldown > 0 a failed endpoint is skipped for cooldown seconds, doubled
+    on every consecutive failure up to max_cooldown.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        endpoint_urls: list[URI | str],
+        *args: Any,
+        strategy: str = "static",
+        latency_decay: float = 10.0,
+        cooldown: float = 0.0,
+        max_cooldown: float = 60.0,
+        **kwargs: Any,
+    ):
+        if strategy not in ("static", "latency"):
+            raise ValueError(f'Strategy "{strategy}" is not supported.')
+
+        super().__init__(endpoint_urls, *args, **kwargs)
+        self._strategy = strategy
+        self._stats = [
+            EndpointStats(latency_decay, cooldown, max_cooldown)
+            for _ in self._providers
+        ]
+
+    def _send(self, request: Callable[[HTTPProvider], T]) -> T:
+        order: Sequence[int] = range(len(self._providers))
+        if self._strategy == "latency":
+            order = order_by_latency(self._stats)
+
+        for index in available_first(self._stats, order):
             try:
-                response = provider.make_request(method, params)
+                return self._request(request, index)
             except Exception as error:  # pylint: disable=broad-except
-                logger.warning(
-                    {
-                        "msg": "Provider not responding.",
-                        "error": str(error).replace(str(provider.endpoint_uri), "****"),
-                    }
-                )
-            else:
-                sanitize_poa_response(method, response)
-
-                logger.debug(
-                    {
-                        "msg": "Send request using FallbackProvider.",
-                        "method": method,
-                        "params": str(params),
-                    }
-                )
-                return response
+                self._log_error(error, self._providers[index])
 
         msg = "No active provider available."
         logger.debug({"msg": msg})
         raise NoActiveProviderError(msg)
+
+    def healthcheck(self) -> list[bool]:
+        """
+        Send eth_chainId to all endpoints concurrently.
+
+        Returns endpoint health in the order endpoints were passed. The results are
+        recorded like regular requests, so failed endpoints are tried last
+        (strategy="latency") or skipped during the cooldown.
+        """
+        if not self._providers:
+            return []
+
+        with ThreadPoolExecutor(max_workers=len(self._providers)) as executor:
+            return list(executor.map(self._probe, range(len(self._providers))))
+
+    def _probe(self, index: int) -> bool:
+        try:
+            self._request(
+                lambda provider: provider.make_request(RPCEndpoint("eth_chainId"), []),
+                index,
+            )
+        except Exception as error:  # pylint: disable=broad-except
+            self._log_error(error, self._providers[index])
+            return False
+        return True
+
+    def _request(self, request: Callable[[HTTPProvider], T], index: int) -> T:
+        with self._stats[index].measure():
+            return request(self._providers[index])
+
+    @staticmethod
+    def _log_error(error: BaseException, provider: HTTPProvider) -> None:
+        logger.warning(
+            {
+                "msg": "Provider not responding.",
+                "error": str(error).replace(str(provider.endpoint_uri), "****"),
+            }
+        )
@@ -1,14 +1,27 @@
 import logging
+from typing import Any
 
 from web3._utils.rpc_abi import RPC
 from web3.exceptions import ExtraDataLengthError
 from web3.middleware.proof_of_authority import extradata_to_poa_cleanup
-from web3.middleware.validation import _check_extradata_length
+from web3.middleware.validation import MAX_EXTRADATA_LENGTH, _check_extradata_length
 from web3.types import RPCEndpoint, RPCResponse
 
 logger = logging.getLogger(__name__)
 
 
+def _is_poa_extradata(extra_data: Any) -> bool:
+    if isinstance(extra_data, str) and extra_data.startswith("0x"):
+        # Nodes return hex strings, the length is checked without decoding them
+        return (len(extra_data) - 1) // 2 > MAX_EXTRADATA_LENGTH
+
+    try:
+        _check_extradata_length(extra_data)
+    except ExtraDataLengthError:
+        return True
+    return False
+
+
 def sanitize_poa_response(method: RPCEndpoint, response: RPCResponse) -> None:
     """Modify the response to remove PoA specific data."""
     if method in (RPC.eth_getBlockByHash, RPC.eth_getBlockByNumber):
@@ -17,9 +30,7 @@ def sanitize_poa_response(method: RPCEndpoint, response: RPCResponse) -> None:
             and isinstance(response["result"], dict)
             and "extraData" in response["result"]
             and "proofOfAuthorityData" not in response["result"]
+            and _is_poa_extradata(response["result"]["extraData"])
         ):
-            try:
-                _check_extradata_length(response["result"]["extraData"])
-            except ExtraDataLengthError:
-                logger.debug({"msg": "PoA blockchain cleanup response."})
-                response["result"] = extradata_to_poa_cleanup(response["result"])
+            logger.debug({"msg": "PoA blockchain cleanup response."})
+            response["result"] = extradata_to_poa_cleanup(response["result"])